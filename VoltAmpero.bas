@@ -64,6 +64,10 @@ Sub ExportCSV()
     RunPython "from voltampero import va_export_csv; va_export_csv()"
 End Sub
 
+Sub ExportXLSX()
+    RunPython "from voltampero import va_export_xlsx; va_export_xlsx()"
+End Sub
+
 Sub ClearData()
     RunPython "from voltampero import va_clear_data; va_clear_data()"
 End Sub
@@ -6,11 +6,16 @@ Windows 11 compatible - no admin rights needed
 """
 
 import time
+import logging
 import struct
 from typing import Optional, List
 from dataclasses import dataclass
 from enum import Enum
 
+# Errors from the polling paths are logged rather than printed, so a slow
+# console cannot stall a sampling thread
+log = logging.getLogger("voltampero.dmm")
+
 try:
     import hid
     HID_AVAILABLE = True
@@ -18,6 +23,19 @@ except ImportError:
     HID_AVAILABLE = False
 
 
+# Precompiled unpacker for the numeric frame fields after the header:
+# mode (3), value (4-7, int32 LE), decimal position (8), range (9)
+_FRAME_UNPACK = struct.Struct('<3xBiBB').unpack_from
+
+# Powers of ten for the decimal point position (clamped to 0-10)
+_DECIMAL_DIV = tuple(10.0 ** i for i in range(11))
+
+
+def _lookup_table(mapping: dict, size: int, default) -> tuple:
+    """Expand a sparse byte->value dict into a tuple indexed by the byte"""
+    return tuple(mapping.get(i, default) for i in range(size))
+
+
 class MeasurementMode(Enum):
     DC_VOLTAGE = "DC V"
     AC_VOLTAGE = "AC V"
@@ -76,6 +94,21 @@ class UNIT_UT8804E:
     CMD_R_VAL = bytes.fromhex("abcd04510001cd")
     CMD_GET_ID = bytes.fromhex("abcd04580001d4")
     
+    # Complete HID output reports (report ID 0 + command), built once
+    _REPORT_HOLD = b'\x00' + CMD_HOLD
+    _REPORT_BRIGHTNESS = b'\x00' + CMD_BRIGHTNESS
+    _REPORT_SELECT = b'\x00' + CMD_SELECT
+    _REPORT_RANGE_MANUAL = b'\x00' + CMD_RANGE_MANUAL
+    _REPORT_RANGE_AUTO = b'\x00' + CMD_RANGE_AUTO
+    _REPORT_MINMAX = b'\x00' + CMD_MINMAX
+    _REPORT_EXIT_MINMAX = b'\x00' + CMD_EXIT_MINMAX
+    _REPORT_REL = b'\x00' + CMD_REL
+    _REPORT_D_VAL = b'\x00' + CMD_D_VAL
+    _REPORT_Q_VAL = b'\x00' + CMD_Q_VAL
+    _REPORT_EXIT_DQR = b'\x00' + CMD_EXIT_DQR
+    _REPORT_R_VAL = b'\x00' + CMD_R_VAL
+    _REPORT_GET_ID = b'\x00' + CMD_GET_ID
+    
     # Mode byte mapping (based on reverse engineering)
     MODE_MAP = {
         0x00: (MeasurementMode.DC_VOLTAGE, "V"),
@@ -107,10 +140,15 @@ class UNIT_UT8804E:
         5: "M",   # mega
     }
     
+    # Tuple tables indexed directly by the masked byte (faster than dict.get)
+    _MODE_TABLE = _lookup_table(MODE_MAP, 32, (MeasurementMode.UNKNOWN, ""))
+    _PREFIX_TABLE = _lookup_table(RANGE_PREFIX, 16, "")
+    
     def __init__(self):
         self.device = None
         self.connected = False
         self.last_reading: Optional[MultimeterReading] = None
+        self._last_raw: Optional[bytearray] = None
         self.device_id = ""
         
     @staticmethod
@@ -151,52 +189,51 @@ class UNIT_UT8804E:
                 pass
         self.device = None
         self.connected = False
+        self.device_id = ""
+        self._last_raw = None
         
     def is_connected(self) -> bool:
         """Check if connected"""
         return self.connected and self.device is not None
     
-    def _send_command(self, cmd: bytes) -> bool:
-        """Send a command to the multimeter"""
+    def _send_command(self, report: bytes) -> bool:
+        """Send a prebuilt HID report (one of the _REPORT_* constants)"""
         if not self.is_connected():
             return False
         try:
-            # HID report with report ID 0
-            self.device.write(b'\x00' + cmd)
+            self.device.write(report)
             return True
         except Exception as e:
-            print(f"Multimeter command error: {e}")
+            log.warning("Multimeter command error: %s", e)
             return False
     
-    def _read_data(self, timeout_ms: int = 100) -> Optional[bytes]:
+    def _read_data(self, timeout_ms: int = 100) -> Optional[bytearray]:
         """Read data from the multimeter"""
         if not self.is_connected():
             return None
         try:
             data = self.device.read(64, timeout_ms)
-            return bytes(data) if data else None
+            return bytearray(data) if data else None
         except Exception as e:
-            print(f"Multimeter read error: {e}")
+            log.warning("Multimeter read error: %s", e)
             return None
     
-    def _parse_reading(self, data: bytes) -> Optional[MultimeterReading]:
-        """Parse raw HID data into a reading"""
+    def _parse_reading(self, data: bytearray, _time=time.time,
+                       _mode_table=_MODE_TABLE, _prefix_table=_PREFIX_TABLE,
+                       _unpack=_FRAME_UNPACK, _div=_DECIMAL_DIV
+                       ) -> Optional[MultimeterReading]:
+        """Parse raw HID data into a reading
+        
+        The underscore keyword defaults bind the lookup tables and helpers
+        as fast locals; callers never pass them.
+        """
         if not data or len(data) < 8:
             return None
             
         try:
-            # Check for valid header (0xAB 0xCD)
-            if len(data) >= 2 and data[0] == 0xAB and data[1] == 0xCD:
-                pass  # Valid packet
-            elif len(data) >= 2 and data[0] != 0xAB:
-                # Try to find header in data
-                idx = data.find(b'\xab\xcd')
-                if idx >= 0:
-                    data = data[idx:]
-                else:
-                    return None
-            
-            if len(data) < 10:
+            # Header (0xAB 0xCD) must lead the report; a misaligned frame is
+            # dropped, the meter sends the next one within ~300 ms
+            if data[0] != 0xAB or data[1] != 0xCD or len(data) < 10:
                 return None
                 
             # Packet structure (approximate, based on UT8803E):
@@ -208,27 +245,21 @@ class UNIT_UT8804E:
             # [9]: Range/unit modifier
             # [10]: Status flags
             
-            mode_byte = data[3] & 0x1F
-            mode_info = self.MODE_MAP.get(mode_byte, (MeasurementMode.UNKNOWN, ""))
+            # All numeric fields in one C-level unpack
+            mode_byte, raw_value, decimal_pos, range_byte = _unpack(data, 0)
+            
+            mode_info = _mode_table[mode_byte & 0x1F]
             mode = mode_info[0]
             base_unit = mode_info[1]
             
-            # Extract value
-            if len(data) >= 8:
-                raw_value = struct.unpack('<i', data[4:8])[0]
-            else:
-                raw_value = 0
-                
             # Decimal position
-            decimal_pos = data[8] if len(data) > 8 else 0
             if decimal_pos > 10:
                 decimal_pos = 4  # Default
                 
-            value = raw_value / (10 ** decimal_pos)
+            value = raw_value / _div[decimal_pos]
             
             # Range/prefix
-            range_byte = data[9] if len(data) > 9 else 0
-            prefix = self.RANGE_PREFIX.get(range_byte & 0x0F, "")
+            prefix = _prefix_table[range_byte & 0x0F]
             unit = prefix + base_unit
             
             # Status flags
@@ -246,27 +277,38 @@ class UNIT_UT8804E:
                 value=value,
                 unit=unit,
                 mode=mode,
-                timestamp=time.time(),
+                timestamp=_time(),
                 range_str=range_str,
                 overflow=overflow,
                 hold=hold,
                 relative=relative,
                 auto_range=auto_range,
                 min_max=min_max,
-                raw_data=data[:16] if len(data) >= 16 else data
+                raw_data=bytes(data[:16])
             )
             
         except Exception as e:
-            print(f"Parse error: {e}")
+            log.warning("Parse error: %s", e)
             return None
     
     def get_reading(self) -> Optional[MultimeterReading]:
         """Get a reading from the multimeter (streams continuously)"""
-        # Device streams at ~3 readings/sec, just read latest
+        # Device streams at ~3 readings/sec; wait for one frame, then drain
+        # anything queued behind it so we parse the newest, not the oldest
         data = self._read_data(500)
+        while data:
+            newer = self._read_data(0)
+            if not newer:
+                break
+            data = newer
         if data:
+            # A static input repeats the same frame; only refresh the time
+            if data == self._last_raw and self.last_reading is not None:
+                self.last_reading.timestamp = time.time()
+                return self.last_reading
             reading = self._parse_reading(data)
             if reading:
+                self._last_raw = data
                 self.last_reading = reading
                 return reading
         return self.last_reading
@@ -279,15 +321,17 @@ class UNIT_UT8804E:
     def get_value_with_unit(self) -> str:
         """Get value formatted with unit"""
         reading = self.get_reading()
-        if reading:
-            if reading.overflow:
-                return f"OL {reading.unit}"
-            return f"{reading.value:.4f} {reading.unit}"
-        return "--- ---"
+        if not reading:
+            return "--- ---"
+        if reading.overflow:
+            return f"OL {reading.unit}"
+        return f"{reading.value:.4f} {reading.unit}"
     
     def get_device_id(self) -> str:
         """Get device identification"""
-        if self._send_command(self.CMD_GET_ID):
+        if self.device_id:
+            return self.device_id
+        if self._send_command(self._REPORT_GET_ID):
             time.sleep(0.2)
             # Read multiple times to get response
             for _ in range(5):
@@ -305,31 +349,31 @@ class UNIT_UT8804E:
     
     def toggle_hold(self) -> bool:
         """Toggle hold mode"""
-        return self._send_command(self.CMD_HOLD)
+        return self._send_command(self._REPORT_HOLD)
     
     def set_auto_range(self) -> bool:
         """Set auto range"""
-        return self._send_command(self.CMD_RANGE_AUTO)
+        return self._send_command(self._REPORT_RANGE_AUTO)
     
     def next_manual_range(self) -> bool:
         """Switch to next manual range"""
-        return self._send_command(self.CMD_RANGE_MANUAL)
+        return self._send_command(self._REPORT_RANGE_MANUAL)
     
     def toggle_relative(self) -> bool:
         """Toggle relative mode"""
-        return self._send_command(self.CMD_REL)
+        return self._send_command(self._REPORT_REL)
     
     def toggle_minmax(self) -> bool:
         """Toggle min/max mode"""
-        return self._send_command(self.CMD_MINMAX)
+        return self._send_command(self._REPORT_MINMAX)
     
     def exit_minmax(self) -> bool:
         """Exit min/max mode"""
-        return self._send_command(self.CMD_EXIT_MINMAX)
+        return self._send_command(self._REPORT_EXIT_MINMAX)
     
     def change_brightness(self) -> bool:
         """Change display brightness"""
-        return self._send_command(self.CMD_BRIGHTNESS)
+        return self._send_command(self._REPORT_BRIGHTNESS)
 
 
 class SimulatedMultimeter:
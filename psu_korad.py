@@ -7,9 +7,16 @@ Windows 11 compatible - no admin rights needed
 import serial
 import serial.tools.list_ports
 import time
+import logging
+import queue
+import threading
 from typing import Optional, Tuple, List
 from dataclasses import dataclass
 
+# Errors from the polling paths are logged rather than printed, so a slow
+# console cannot stall a sampling thread
+log = logging.getLogger("voltampero.psu")
+
 
 @dataclass
 class PSUStatus:
@@ -26,13 +33,37 @@ class PSUStatus:
 class KoradKWR102:
     """Driver for Korad KWR102 Power Supply"""
     
-    def __init__(self, port: str = "", baudrate: int = 115200, timeout: float = 1.0):
+    # Reply widths of the fixed-format queries (no terminator is sent).
+    # Reading exactly this many bytes returns as soon as the reply is in,
+    # instead of waiting out the serial timeout.
+    REPLY_LEN = {
+        "VSET1?": 5,
+        "ISET1?": 5,
+        "VOUT1?": 5,
+        "IOUT1?": 5,
+        "STATUS?": 1,
+    }
+    # Current replies gain a digit from 10 A up ("9.500" vs "10.500"); a
+    # point at index 2 of the first REPLY_LEN bytes means one more follows
+    WIDE_REPLY_CMDS = ("ISET1?", "IOUT1?")
+    
+    # Setpoint command templates, formatted straight to bytes so the ramp
+    # path needs no f-string format spec and no str.encode
+    VSET_FMT = b"VSET1:%05.2f"
+    ISET_FMT = b"ISET1:%05.3f"
+    
+    def __init__(self, port: str = "", baudrate: int = 115200, timeout: float = 1.0,
+                 status_min_interval: float = 0.1):
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
         self.serial: Optional[serial.Serial] = None
         self._ocp_enabled = False
         self._ovp_enabled = False
+        self.status_min_interval = status_min_interval
+        self._status_cache: Optional[PSUStatus] = None
+        self._status_time = 0.0
+        self._idn_cache: Optional[str] = None
         
     @staticmethod
     def list_ports() -> List[str]:
@@ -71,6 +102,8 @@ class KoradKWR102:
             except:
                 pass
         self.serial = None
+        self._status_cache = None
+        self._idn_cache = None
             
     def is_connected(self) -> bool:
         """Check if connected"""
@@ -84,61 +117,111 @@ class KoradKWR102:
             self.serial.reset_input_buffer()
             self.serial.write(cmd.encode('ascii'))
             time.sleep(0.05)
-            if '?' in cmd:
+            if cmd.endswith('?'):  # Queries end in '?'
                 response = self.serial.read(100).decode('ascii').strip()
                 return response
+            self._status_cache = None  # A setting changed
             return ""
         except Exception as e:
-            print(f"PSU command error: {e}")
+            log.warning("PSU command error: %s", e)
+            return None
+    
+    def _query_float(self, cmd: str) -> float:
+        """Send a fixed-width numeric query and parse the raw reply bytes
+        
+        Reads exactly the reply width (see _read_reply), so the call returns
+        as soon as the reply is in rather than after a settle delay and
+        read timeout.
+        """
+        if not self.is_connected():
+            return 0.0
+        try:
+            self.serial.reset_input_buffer()
+            self.serial.write(cmd.encode('ascii'))
+            return float(self._read_reply(cmd))
+        except ValueError:
+            return 0.0
+        except Exception as e:
+            log.warning("PSU command error: %s", e)
+            return 0.0
+    
+    def _write(self, data: bytes) -> bool:
+        """Write an already-encoded setting command (no response expected)"""
+        if not self.is_connected():
+            return False
+        try:
+            self.serial.write(data)
+            time.sleep(0.05)
+            self._status_cache = None  # A setting changed
+            return True
+        except Exception as e:
+            log.warning("PSU command error: %s", e)
+            return False
+    
+    def _send_batch(self, cmds: List[str]) -> Optional[List[str]]:
+        """Send several fixed-width queries and return their replies in order
+        
+        Each reply is read with its exact length from REPLY_LEN, so the
+        batch costs one round-trip per query rather than a fixed delay plus
+        a full read timeout. Replies are decoded as latin-1 so binary
+        status bytes survive.
+        """
+        if not self.is_connected():
             return None
+        try:
+            replies = []
+            for cmd in cmds:
+                # Reset per query so a stray byte cannot shift later replies
+                self.serial.reset_input_buffer()
+                self.serial.write(cmd.encode('ascii'))
+                replies.append(self._read_reply(cmd).decode('latin-1'))
+            return replies
+        except Exception as e:
+            log.warning("PSU command error: %s", e)
+            return None
+    
+    def _read_reply(self, cmd: str) -> bytes:
+        """Read the reply to a fixed-format query, widening 10 A+ currents"""
+        reply = self.serial.read(self.REPLY_LEN.get(cmd, 100))
+        if cmd in self.WIDE_REPLY_CMDS and reply[2:3] == b".":
+            reply += self.serial.read(1)
+        return reply
     
     def get_identification(self) -> str:
-        """Get device identification string"""
-        return self._send_command("*IDN?") or "Unknown"
+        """Get device identification string (queried once per connection)"""
+        if self._idn_cache is not None:
+            return self._idn_cache
+        response = self._send_command("*IDN?")
+        if not response:
+            return "Unknown"
+        self._idn_cache = response
+        return response
     
     def set_voltage(self, voltage: float) -> bool:
         """Set output voltage (V)"""
         voltage = max(0, min(voltage, 60))  # Clamp to safe range
-        cmd = f"VSET1:{voltage:05.2f}"
-        return self._send_command(cmd) is not None
+        return self._write(self.VSET_FMT % voltage)
     
     def get_voltage_setpoint(self) -> float:
         """Get voltage setpoint (V)"""
-        response = self._send_command("VSET1?")
-        try:
-            return float(response) if response else 0.0
-        except ValueError:
-            return 0.0
+        return self._query_float("VSET1?")
     
     def get_output_voltage(self) -> float:
         """Get actual output voltage (V)"""
-        response = self._send_command("VOUT1?")
-        try:
-            return float(response) if response else 0.0
-        except ValueError:
-            return 0.0
+        return self._query_float("VOUT1?")
     
     def set_current(self, current: float) -> bool:
         """Set current limit (A)"""
         current = max(0, min(current, 30))  # Clamp to safe range
-        cmd = f"ISET1:{current:05.3f}"
-        return self._send_command(cmd) is not None
+        return self._write(self.ISET_FMT % current)
     
     def get_current_setpoint(self) -> float:
         """Get current setpoint (A)"""
-        response = self._send_command("ISET1?")
-        try:
-            return float(response) if response else 0.0
-        except ValueError:
-            return 0.0
+        return self._query_float("ISET1?")
     
     def get_output_current(self) -> float:
         """Get actual output current (A)"""
-        response = self._send_command("IOUT1?")
-        try:
-            return float(response) if response else 0.0
-        except ValueError:
-            return 0.0
+        return self._query_float("IOUT1?")
     
     def set_output(self, on: bool) -> bool:
         """Turn output on or off"""
@@ -170,30 +253,52 @@ class KoradKWR102:
         return result
     
     def get_status(self) -> PSUStatus:
-        """Get full status of the power supply"""
-        status_response = self._send_command("STATUS?")
+        """Get full status of the power supply
+        
+        All five queries go out as one batch. The result is reused for
+        status_min_interval seconds so rapid repeated polls stay off the
+        serial line.
+        """
+        now = time.monotonic()
+        if (self._status_cache is not None
+                and now - self._status_time < self.status_min_interval):
+            return self._status_cache
+        
+        replies = self._send_batch(["VOUT1?", "IOUT1?", "VSET1?", "ISET1?", "STATUS?"])
+        cacheable = replies is not None
+        if not replies:
+            replies = ["", "", "", "", ""]
+        
+        values = []
+        for response in replies[:4]:
+            try:
+                values.append(float(response) if response else 0.0)
+            except ValueError:
+                values.append(0.0)
         
         output_on = False
         mode = "CV"
         
+        status_response = replies[4]
         if status_response:
-            try:
-                status = ord(status_response[0]) if len(status_response) > 0 else 0
-                output_on = bool(status & 0x40)
-                mode = "CC" if (status & 0x01) else "CV"
-            except:
-                pass
-        
-        return PSUStatus(
-            voltage=self.get_output_voltage(),
-            current=self.get_output_current(),
-            voltage_setpoint=self.get_voltage_setpoint(),
-            current_setpoint=self.get_current_setpoint(),
+            status = ord(status_response[0])
+            output_on = bool(status & 0x40)
+            mode = "CC" if (status & 0x01) else "CV"
+        
+        status = PSUStatus(
+            voltage=values[0],
+            current=values[1],
+            voltage_setpoint=values[2],
+            current_setpoint=values[3],
             output_on=output_on,
             ocp_on=self._ocp_enabled,
             ovp_on=self._ovp_enabled,
             mode=mode
         )
+        if cacheable:
+            self._status_cache = status
+            self._status_time = now
+        return status
     
     def get_readings(self) -> Tuple[float, float]:
         """Get voltage and current readings as tuple (V, A)"""
@@ -211,6 +316,10 @@ class VoltageRamp:
         self.current_cycle = 0
         self.total_cycles = 1
         self.progress_callback = None
+        # Set while not paused / once stopped; waited on instead of polling
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._stop_event = threading.Event()
         
     def configure(self, start_v: float, end_v: float, duration_s: float,
                   cycles: int = 1, delay_between_s: float = 0.0,
@@ -237,8 +346,43 @@ class VoltageRamp:
         self.progress_callback = progress_callback
         self.running = True
         self.paused = False
+        self._stop_event.clear()
+        self._resume_event.set()
         self.current_cycle = 0
         
+        # Progress is handed to a worker thread so a slow callback (Excel
+        # COM writes) never delays the next PSU setpoint. The queue belongs
+        # to this run only, so a previous run still draining cannot touch it
+        progress_queue = None
+        progress_thread = None
+        if progress_callback:
+            progress_queue = queue.Queue()
+            progress_thread = threading.Thread(
+                target=self._progress_worker,
+                args=(progress_queue, progress_callback),
+                daemon=True
+            )
+            progress_thread.start()
+        
+        try:
+            self._run_cycles(start_v, end_v, duration_s, cycles,
+                             delay_between_s, ping_pong, step_interval,
+                             progress_queue.put if progress_queue else None)
+        finally:
+            self.running = False
+            if progress_thread:
+                progress_queue.put(None)
+                progress_thread.join()
+        
+    def _run_cycles(self, start_v: float, end_v: float, duration_s: float,
+                    cycles: int, delay_between_s: float, ping_pong: bool,
+                    step_interval: float, report=None):
+        """Run ramp cycles until done or stopped"""
+        # Both directions are planned once and reused by every cycle
+        forward = list(self._ramp_plan(start_v, end_v, duration_s, step_interval))
+        reverse = (list(self._ramp_plan(end_v, start_v, duration_s, step_interval))
+                   if ping_pong else forward)
+        
         cycle_count = 0
         direction = 1  # 1 = forward, -1 = reverse
         
@@ -246,17 +390,9 @@ class VoltageRamp:
             cycle_count += 1
             self.current_cycle = cycle_count
             
-            # Determine start/end for this cycle
-            if ping_pong and direction == -1:
-                cycle_start = end_v
-                cycle_end = start_v
-            else:
-                cycle_start = start_v
-                cycle_end = end_v
-            
             # Execute single ramp
-            self._run_single_ramp(cycle_start, cycle_end, duration_s, 
-                                   step_interval, cycle_count, cycles)
+            self._run_single_ramp(reverse if direction == -1 else forward,
+                                  cycle_count, cycles, report)
             
             if not self.running:
                 break
@@ -269,63 +405,107 @@ class VoltageRamp:
             if ping_pong:
                 direction *= -1
                 
-            # Delay between cycles
-            if delay_between_s > 0 and self.running:
-                delay_steps = int(delay_between_s / 0.1)
-                for _ in range(delay_steps):
-                    if not self.running:
-                        break
-                    while self.paused and self.running:
-                        time.sleep(0.1)
-                    time.sleep(0.1)
+            # Delay between cycles (a pause is honoured at the next step)
+            if delay_between_s > 0 and self._stop_event.wait(delay_between_s):
+                break
         
-        self.running = False
+    def _ramp_plan(self, start_v: float, end_v: float, duration_s: float,
+                   step_interval: float):
+        """Yield (due_offset_s, voltage, progress_pct) for each ramp step
         
-    def _run_single_ramp(self, start_v: float, end_v: float, duration_s: float,
-                         step_interval: float, current_cycle: int, total_cycles: int):
-        """Execute a single voltage ramp"""
+        Setpoints come from the step index, so float error does not
+        accumulate and the last step lands exactly on end_v. A zero
+        duration is a single immediate step to end_v.
+        """
         if duration_s <= 0:
-            self.psu.set_voltage(end_v)
+            yield (0.0, end_v, 100.0)
             return
-            
         steps = int(duration_s / step_interval)
         if steps < 1:
             steps = 1
+        span = end_v - start_v
+        for i in range(steps + 1):
+            yield (i * step_interval, round(start_v + span * i / steps, 3),
+                   (i / steps) * 100)
             
-        voltage_step = (end_v - start_v) / steps
-        self.current_voltage = start_v
-        self.psu.set_voltage(self.current_voltage)
+    def _run_single_ramp(self, plan: List[Tuple[float, float, float]],
+                         current_cycle: int, total_cycles: int, report=None):
+        """Execute a single voltage ramp from a precomputed plan
         
-        for i in range(steps + 1):
+        report, if given, receives (cycle, total_cycles, voltage, progress_pct)
+        after each step.
+        """
+        # Bound once; the loop below runs once per step
+        set_voltage = self.psu.set_voltage
+        monotonic = time.monotonic
+        resumed = self._resume_event
+        stop_wait = self._stop_event.wait
+        
+        # Each step is due at t0 + offset; sleeping to absolute deadlines
+        # keeps command latency from stretching the ramp
+        t0 = monotonic()
+        for offset, voltage, progress_pct in plan:
             if not self.running:
                 break
                 
-            while self.paused and self.running:
-                time.sleep(0.1)
+            if not resumed.is_set():
+                paused_at = monotonic()
+                resumed.wait()
+                if not self.running:
+                    break
+                t0 += monotonic() - paused_at
                 
-            if i > 0:
-                time.sleep(step_interval)
-                self.current_voltage = start_v + (voltage_step * i)
-                self.current_voltage = round(self.current_voltage, 3)
-                self.psu.set_voltage(self.current_voltage)
+            delay = t0 + offset - monotonic()
+            if delay > 0 and stop_wait(delay):
+                break
+            self.current_voltage = voltage
+            set_voltage(voltage)
             
-            if self.progress_callback:
-                progress_pct = (i / steps) * 100
-                self.progress_callback(current_cycle, total_cycles, 
-                                       self.current_voltage, progress_pct)
+            if report:
+                report((current_cycle, total_cycles, voltage, progress_pct))
+                
+    @staticmethod
+    def _progress_worker(updates: queue.Queue, callback):
+        """Deliver queued progress updates until the None sentinel
+        
+        Updates that pile up while the callback is busy are collapsed to
+        the newest one.
+        """
+        done = False
+        while not done:
+            update = updates.get()
+            if update is None:
+                break
+            while True:
+                try:
+                    newer = updates.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    done = True
+                    break
+                update = newer
+            try:
+                callback(*update)
+            except Exception as e:
+                log.warning("Ramp progress callback error: %s", e)
                 
     def stop(self):
         """Stop the voltage ramp"""
         self.running = False
         self.paused = False
+        self._stop_event.set()
+        self._resume_event.set()  # Release a paused ramp so it can exit
         
     def pause(self):
         """Pause the voltage ramp"""
         self.paused = True
+        self._resume_event.clear()
         
     def resume(self):
         """Resume the voltage ramp"""
         self.paused = False
+        self._resume_event.set()
         
     def is_running(self) -> bool:
         """Check if ramp is running"""
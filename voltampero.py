@@ -6,9 +6,22 @@ Controls Korad KWR102 PSU and UNI-T UT8804E Multimeter
 
 import time
 import threading
+import logging
+import logging.handlers
+import queue
+import atexit
 import csv
 import os
-from datetime import datetime
+import math
+import shutil
+import tempfile
+import pickle
+from array import array
+from collections import deque
+from itertools import chain
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
 from typing import Optional, List, Tuple
 from dataclasses import dataclass
 
@@ -19,12 +32,42 @@ except ImportError:
     XLWINGS_AVAILABLE = False
     print("xlwings not installed. Install with: pip install xlwings")
 
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    from pywintypes import com_error
+    _EXCEL_ERRORS = (com_error, AttributeError)
+except ImportError:
+    # Non-Windows xlwings backends raise their own error types
+    _EXCEL_ERRORS = (Exception,)
+
 from psu_korad import KoradKWR102, VoltageRamp, SimulatedPSU
 from multimeter_unit import UNIT_UT8804E, SimulatedMultimeter, MultimeterReading
 
+# Errors on the sampling/flush threads go through a queue so a slow console
+# write never stalls them; the listener thread does the actual output.
+# The driver loggers ("voltampero.psu", "voltampero.dmm") propagate here.
+# Set up only once: a UDF server reload re-runs this module
+log = logging.getLogger("voltampero")
+if not log.handlers:
+    _log_queue = queue.Queue(-1)
+    _log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    log.addHandler(logging.handlers.QueueHandler(_log_queue))
+    log.propagate = False
 
 @dataclass
 class LogEntry:
+    # Explicit __slots__ rather than dataclass(slots=True), which needs 3.10
+    __slots__ = ("timestamp", "elapsed_s", "psu_voltage", "psu_current",
+                 "psu_setpoint_v", "psu_setpoint_a", "dmm_value", "dmm_unit",
+                 "dmm_mode")
+    
     timestamp: datetime
     elapsed_s: float
     psu_voltage: float
@@ -36,9 +79,178 @@ class LogEntry:
     dmm_mode: str
 
 
+def _format_column(fmt: str, column, block: int = 8192):
+    """Lazily format a numeric column, one % operation per block of values"""
+    fmt += "\n"
+    for i in range(0, len(column), block):
+        values = tuple(column[i:i + block])
+        yield ((fmt * len(values)) % values).split("\n")[:-1]
+
+
+# Timestamps are naive local times. They are stored as seconds since this
+# naive epoch, i.e. from their own date/time fields, not via the local
+# timezone, so times around a DST change survive the round trip unchanged
+_WALL_EPOCH = datetime(1970, 1, 1)
+_ONE_SECOND = timedelta(seconds=1)
+
+
+def _to_wall_seconds(timestamp: datetime) -> float:
+    """Convert a naive timestamp to seconds since _WALL_EPOCH"""
+    return (timestamp - _WALL_EPOCH) / _ONE_SECOND
+
+
+def _from_wall_seconds(seconds: float) -> datetime:
+    """Convert seconds since _WALL_EPOCH back to a naive timestamp"""
+    return _WALL_EPOCH + timedelta(seconds=seconds)
+
+
+def _timestamp_formatter():
+    """Return a function formatting wall seconds like
+    _from_wall_seconds(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    
+    Samples share whole seconds, so the strftime part is cached per second
+    and only the milliseconds are formatted per call.
+    """
+    seconds_cache = {}
+    
+    def format_timestamp(ts: float) -> str:
+        frac, whole = math.modf(ts)
+        us = round(frac * 1e6)
+        if us >= 1000000:
+            whole += 1
+            us -= 1000000
+        prefix = seconds_cache.get(whole)
+        if prefix is None:
+            prefix = _from_wall_seconds(whole).strftime("%Y-%m-%d %H:%M:%S")
+            seconds_cache[whole] = prefix
+        return f"{prefix}.{us // 1000:03d}"
+    
+    return format_timestamp
+
+
+def _blank_nan(row: tuple) -> tuple:
+    """Replace NaN (a timed-out read) with None so the cell stays empty"""
+    return tuple(None if value != value else value for value in row)
+
+
+# Spill directories still on disk; removed at exit if nothing else did
+_spill_dirs = set()
+
+
+def _remove_spill_dirs():
+    """Delete spill directories left behind when the process exits"""
+    for path in list(_spill_dirs):
+        shutil.rmtree(path, ignore_errors=True)
+    _spill_dirs.clear()
+
+
+atexit.register(_remove_spill_dirs)
+
+
+CSV_HEADER = (
+    "Timestamp", "Elapsed_s", "PSU_Voltage_V", "PSU_Current_A",
+    "PSU_Setpoint_V", "PSU_Setpoint_A", "DMM_Value", "DMM_Unit", "DMM_Mode"
+)
+
+
+def _write_csv_columns(writer, columns: tuple):
+    """Write LogBuffer-style columns as CSV rows"""
+    # Format column by column: numbers in blocks through _format_column
+    # (one % per block), timestamps through the per-second cached
+    # formatter; writerows then pulls the zipped rows without a Python loop
+    (timestamps, elapsed_s, psu_v, psu_a, set_v, set_a,
+     dmm_value, dmm_unit, dmm_mode) = columns
+    writer.writerows(zip(
+        map(_timestamp_formatter(), timestamps),
+        chain.from_iterable(_format_column("%.3f", elapsed_s)),
+        chain.from_iterable(_format_column("%.4f", psu_v)),
+        chain.from_iterable(_format_column("%.4f", psu_a)),
+        chain.from_iterable(_format_column("%.2f", set_v)),
+        chain.from_iterable(_format_column("%.3f", set_a)),
+        chain.from_iterable(_format_column("%.6f", dmm_value)),
+        dmm_unit,
+        dmm_mode
+    ))
+
+
+class LogBuffer:
+    """Column-oriented ring buffer of log samples
+    
+    Numeric fields are stored unboxed in array('d') columns (timestamps as
+    wall seconds, see _WALL_EPOCH) and the unit/mode strings in lists. Once `capacity`
+    samples are held, each new one overwrites the oldest.
+    """
+    
+    def __init__(self, capacity: int = 1_000_000):
+        self.capacity = capacity
+        self.clear()
+        
+    def clear(self):
+        """Drop all samples"""
+        self._set_columns((
+            array('d'), array('d'), array('d'), array('d'), array('d'),
+            array('d'), array('d'), [], []
+        ))
+        
+    def _set_columns(self, columns: tuple):
+        """Bind chronologically ordered columns as the buffer contents"""
+        self._head = 0  # Index of the oldest sample once the buffer is full
+        (self.timestamp, self.elapsed_s, self.psu_voltage, self.psu_current,
+         self.psu_setpoint_v, self.psu_setpoint_a, self.dmm_value,
+         self.dmm_unit, self.dmm_mode) = columns
+        self._columns = columns
+        
+    def __len__(self) -> int:
+        return len(self.timestamp)
+    
+    def append(self, entry: LogEntry):
+        """Store a sample, overwriting the oldest one when full"""
+        values = (
+            _to_wall_seconds(entry.timestamp), entry.elapsed_s, entry.psu_voltage,
+            entry.psu_current, entry.psu_setpoint_v, entry.psu_setpoint_a,
+            entry.dmm_value, entry.dmm_unit, entry.dmm_mode
+        )
+        if len(self.timestamp) < self.capacity:
+            for column, value in zip(self._columns, values):
+                column.append(value)
+        else:
+            head = self._head
+            for column, value in zip(self._columns, values):
+                column[head] = value
+            self._head = (head + 1) % self.capacity
+            
+    def columns(self) -> tuple:
+        """Return the nine columns in chronological order"""
+        head = self._head
+        if head == 0:
+            return self._columns
+        return tuple(column[head:] + column[:head] for column in self._columns)
+    
+    def pop_oldest(self, count: int) -> tuple:
+        """Remove the oldest `count` samples and return them as columns
+        
+        The buffer is rebound to new column objects, so columns previously
+        returned by columns() stay intact.
+        """
+        ordered = self.columns()
+        taken = tuple(column[:count] for column in ordered)
+        self._set_columns(tuple(column[count:] for column in ordered))
+        return taken
+    
+    def __iter__(self):
+        for row in zip(*self.columns()):
+            yield LogEntry(_from_wall_seconds(row[0]), *row[1:])
+
+
 class VoltAmpero:
     """Main controller class for VoltAmpero system"""
     
+    # Logged for a device whose read timed out
+    _READ_MISSING = {
+        "psu": (math.nan, math.nan, math.nan, math.nan),
+        "dmm": (math.nan, "", ""),
+    }
+    
     def __init__(self, simulate: bool = False):
         self.simulate = simulate
         
@@ -54,20 +266,63 @@ class VoltAmpero:
         
         # Logging state
         self.logging_active = False
-        self.log_data: List[LogEntry] = []
+        self.log_data = LogBuffer()
         self.log_start_time: Optional[datetime] = None
+        self._log_mono_start = 0.0
         self.log_interval_ms = 300
         self._log_thread: Optional[threading.Thread] = None
         self._stop_logging = threading.Event()
+        # Once _spill_threshold samples are in memory, the oldest half is
+        # written to a shard in _spill_dir by a background worker
+        self._spill_threshold = 100_000
+        self._spill_shard = 0
+        self._spill_dir: Optional[str] = None
+        self._spill_files: List[str] = []
+        self._spill_count = 0
+        self._spill_pool: Optional[ThreadPoolExecutor] = None
+        self._spill_futures: list = []
+        self._spill_lock = threading.Lock()
         
         # Excel integration
         self.wb: Optional[xw.Book] = None
+        self._app = None
         self.data_sheet = None
         self.control_sheet = None
         self._excel_update_row = 2
+        self._excel_last_written_row = 1  # Last Data row written by us
+        # Control sheet named ranges, resolved once in attach_excel
+        self._r_live_v = None
+        self._r_live_i = None
+        self._r_live_dmm = None
+        self._r_ramp_cycle = None
+        self._r_ramp_v = None
+        self._r_ramp_prog = None
+        self.live_display_enabled = True
+        # Samples waiting for the flusher thread, which writes them to the
+        # Data sheet in blocks so slow COM calls never hold up sampling
+        self._excel_queue: deque = deque(maxlen=self.log_data.capacity)
+        self._excel_cv = threading.Condition()
+        # Held while rows are taken from the queue and written, so a drain
+        # from stop_logging cannot interleave with a flush still in progress
+        self._excel_write_lock = threading.RLock()
+        self._flush_thread: Optional[threading.Thread] = None
+        self._pending_flush_size = 10
+        self._pending_max_age_s = 1.0
+        # Latest ramp progress waiting for the flusher while logging runs
+        self._pending_ramp: Optional[tuple] = None
         
         # Ramp state
         self._ramp_thread: Optional[threading.Thread] = None
+        self._ramp_ui_interval_s = 0.1
+        self._last_ramp_ui = 0.0
+        
+        # PSU and DMM sit on separate ports, so a sample reads them in
+        # parallel, each on its own single worker. A read still running from
+        # an earlier sample is waited on again rather than queued behind, and
+        # a timed-out read is logged as NaN (blank in Excel)
+        self._io_pools = {}
+        self._io_futures = {}
+        self._io_timeout_s = 1.0
         
     # ========== Connection Methods ==========
     
@@ -111,6 +366,14 @@ class VoltAmpero:
         self.stop_ramp()
         self.disconnect_psu()
         self.disconnect_dmm()
+        for pool in self._io_pools.values():
+            pool.shutdown(wait=False)
+        self._io_pools.clear()
+        self._io_futures.clear()
+        if self._spill_pool:
+            self._spill_pool.shutdown(wait=True)
+            self._spill_pool = None
+        self._reset_spill()
         
     # ========== PSU Control Methods ==========
     
@@ -154,7 +417,7 @@ class VoltAmpero:
         """Start voltage ramp in background thread"""
         if self._ramp_thread and self._ramp_thread.is_alive():
             self.stop_ramp()
-            time.sleep(0.2)
+            self._ramp_thread.join(timeout=0.5)
             
         def ramp_with_callback():
             self.voltage_ramp.start(
@@ -168,6 +431,7 @@ class VoltAmpero:
             )
             self._update_excel_status("Ramp", "Stopped")
             
+        self._last_ramp_ui = 0.0
         self._update_excel_status("Ramp", "Running")
         self._ramp_thread = threading.Thread(target=ramp_with_callback, daemon=True)
         self._ramp_thread.start()
@@ -193,14 +457,34 @@ class VoltAmpero:
     
     def _ramp_progress_callback(self, cycle: int, total_cycles: int, 
                                  voltage: float, progress_pct: float):
-        """Called during ramp to update Excel"""
-        if self.control_sheet:
-            try:
-                self.control_sheet.range("RampCycle").value = f"{cycle}/{total_cycles if total_cycles > 0 else '∞'}"
-                self.control_sheet.range("RampVoltage").value = voltage
-                self.control_sheet.range("RampProgress").value = progress_pct / 100
-            except:
-                pass
+        """Called during ramp to update Excel, at most every _ramp_ui_interval_s"""
+        # Always let the final step through so Excel ends on 100%
+        now = time.monotonic()
+        if now - self._last_ramp_ui < self._ramp_ui_interval_s and progress_pct < 100:
+            return
+        self._last_ramp_ui = now
+        progress = (cycle, total_cycles, voltage, progress_pct)
+        # While logging, the flusher is the only Excel writer: hand it the
+        # newest progress so it lands in the same wakeup as the next rows
+        with self._excel_cv:
+            if self.logging_active:
+                self._pending_ramp = progress
+                self._excel_cv.notify()
+                return
+        self._write_ramp_progress(progress)
+    
+    def _write_ramp_progress(self, progress: tuple):
+        """Write (cycle, total_cycles, voltage, progress_pct) to the ramp cells"""
+        cycle, total_cycles, voltage, progress_pct = progress
+        try:
+            if self._r_ramp_cycle is not None:
+                self._r_ramp_cycle.value = f"{cycle}/{total_cycles if total_cycles > 0 else '∞'}"
+            if self._r_ramp_v is not None:
+                self._r_ramp_v.value = voltage
+            if self._r_ramp_prog is not None:
+                self._r_ramp_prog.value = progress_pct / 100
+        except _EXCEL_ERRORS:
+            pass
                 
     # ========== DMM Methods ==========
     
@@ -224,23 +508,23 @@ class VoltAmpero:
             return
             
         self.log_interval_ms = interval_ms
-        self.log_data = []
+        self.log_data.clear()
+        self._reset_spill()
+        self._io_futures.clear()  # Never report a previous session's read
         self.log_start_time = datetime.now()
+        self._log_mono_start = time.monotonic()
         self._stop_logging.clear()
         self.logging_active = True
         self._excel_update_row = 2
+        self._excel_queue.clear()
         
         # Clear previous data in Excel
-        if self.data_sheet:
-            try:
-                last_row = self.data_sheet.range("A1").end('down').row
-                if last_row > 1:
-                    self.data_sheet.range(f"A2:I{last_row}").clear_contents()
-            except:
-                pass
+        self._clear_data_sheet()
         
         self._log_thread = threading.Thread(target=self._logging_loop, daemon=True)
         self._log_thread.start()
+        self._flush_thread = threading.Thread(target=self._flusher_loop, daemon=True)
+        self._flush_thread.start()
         self._update_excel_status("Logging", "Active")
     
     def stop_logging(self):
@@ -249,43 +533,72 @@ class VoltAmpero:
         self.logging_active = False
         if self._log_thread:
             self._log_thread.join(timeout=1.0)
+        with self._excel_cv:
+            self._excel_cv.notify()
+        if self._flush_thread:
+            self._flush_thread.join(timeout=2.0)
+        self._drain_excel_queue()  # Anything queued after the flusher's last pass
         self._update_excel_status("Logging", "Stopped")
     
     def _logging_loop(self):
         """Background logging loop"""
-        while not self._stop_logging.is_set():
+        # Samples are due on a fixed monotonic grid, so the time spent
+        # reading the devices does not stretch the interval
+        period = self.log_interval_ms / 1000.0
+        # Bind the per-sample lookups once; they matter at short intervals
+        capture = self._capture_reading
+        log_data = self.log_data
+        append = log_data.append
+        spill_threshold = self._spill_threshold
+        cv = self._excel_cv
+        pending = self._excel_queue
+        enqueue = pending.append
+        flush_size = self._pending_flush_size
+        is_set = self._stop_logging.is_set
+        wait = self._stop_logging.wait
+        monotonic = time.monotonic
+        next_tick = monotonic()
+        while not is_set():
             try:
-                entry = self._capture_reading()
+                entry = capture()
                 if entry:
-                    self.log_data.append(entry)
-                    self._write_entry_to_excel(entry)
+                    append(entry)
+                    if len(log_data) >= spill_threshold:
+                        self._spill_oldest()
+                    if self.data_sheet:
+                        with cv:
+                            enqueue(entry)
+                            if len(pending) >= flush_size:
+                                cv.notify()
             except Exception as e:
-                print(f"Logging error: {e}")
+                log.warning("Logging error: %s", e)
                 
-            # Wait for next interval
-            self._stop_logging.wait(self.log_interval_ms / 1000.0)
+            # Wait for next interval; if we overran, restart the grid from
+            # now instead of firing a burst of catch-up samples
+            next_tick += period
+            sleep_for = next_tick - monotonic()
+            if sleep_for < 0:
+                next_tick = monotonic()
+                continue
+            if wait(sleep_for):
+                break
     
     def _capture_reading(self) -> Optional[LogEntry]:
         """Capture a single reading from both devices"""
-        now = datetime.now()
-        elapsed = (now - self.log_start_time).total_seconds() if self.log_start_time else 0
-        
-        # Read PSU
-        psu_v, psu_a = 0.0, 0.0
-        psu_set_v, psu_set_a = 0.0, 0.0
-        if self.psu.is_connected():
-            psu_v, psu_a = self.psu.get_readings()
-            psu_set_v = self.psu.get_voltage_setpoint()
-            psu_set_a = self.psu.get_current_setpoint()
+        # Elapsed time comes from the monotonic clock, so wall-clock
+        # adjustments during a run cannot make it jump or go backwards
+        if self.log_start_time:
+            elapsed = time.monotonic() - self._log_mono_start
+            now = self.log_start_time + timedelta(seconds=elapsed)
+        else:
+            elapsed = 0
+            now = datetime.now()
         
-        # Read DMM
-        dmm_val, dmm_unit, dmm_mode = 0.0, "", ""
-        if self.dmm.is_connected():
-            reading = self.dmm.get_reading()
-            if reading:
-                dmm_val = reading.value
-                dmm_unit = reading.unit
-                dmm_mode = reading.mode.value
+        # Read both devices at once; the sample takes as long as the slower one
+        f_psu = self._submit_read("psu", self._read_psu_bundle)
+        f_dmm = self._submit_read("dmm", self._read_dmm_bundle)
+        psu_v, psu_a, psu_set_v, psu_set_a = self._collect_read("psu", f_psu)
+        dmm_val, dmm_unit, dmm_mode = self._collect_read("dmm", f_dmm)
         
         return LogEntry(
             timestamp=now,
@@ -299,70 +612,267 @@ class VoltAmpero:
             dmm_mode=dmm_mode
         )
     
-    def _write_entry_to_excel(self, entry: LogEntry):
-        """Write a log entry to Excel"""
-        if not self.data_sheet:
-            return
+    def _submit_read(self, device: str, read) -> Future:
+        """Start a read on the device's worker unless one is still running"""
+        future = self._io_futures.get(device)
+        if future is None or future.done():
+            pool = self._io_pools.get(device)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"va_{device}")
+                self._io_pools[device] = pool
+            future = pool.submit(read)
+            self._io_futures[device] = future
+        return future
+    
+    def _collect_read(self, device: str, future: Future) -> tuple:
+        """Return a read's result, or NaN values if it timed out"""
         try:
-            row = self._excel_update_row
-            self.data_sheet.range(f"A{row}").value = [
-                entry.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
-                entry.elapsed_s,
-                entry.psu_voltage,
-                entry.psu_current,
-                entry.psu_setpoint_v,
-                entry.psu_setpoint_a,
-                entry.dmm_value,
-                entry.dmm_unit,
-                entry.dmm_mode
-            ]
-            self._excel_update_row += 1
-            
-            # Update live display cells
-            if self.control_sheet:
-                self.control_sheet.range("LiveVoltage").value = entry.psu_voltage
-                self.control_sheet.range("LiveCurrent").value = entry.psu_current
-                self.control_sheet.range("LiveDMM").value = f"{entry.dmm_value:.4f} {entry.dmm_unit}"
-        except Exception as e:
-            print(f"Excel write error: {e}")
+            return future.result(timeout=self._io_timeout_s)
+        except FutureTimeoutError:
+            log.warning("%s read timed out; sample marked missing", device.upper())
+            return self._READ_MISSING[device]
+    
+    def _read_psu_bundle(self) -> Tuple[float, float, float, float]:
+        """Read PSU output V/A and setpoints V/A (zeros if disconnected)"""
+        if not self.psu.is_connected():
+            return 0.0, 0.0, 0.0, 0.0
+        psu_v, psu_a = self.psu.get_readings()
+        return (psu_v, psu_a, self.psu.get_voltage_setpoint(),
+                self.psu.get_current_setpoint())
+    
+    def _read_dmm_bundle(self) -> Tuple[float, str, str]:
+        """Read DMM value, unit and mode (zero/empty if unavailable)"""
+        if not self.dmm.is_connected():
+            return 0.0, "", ""
+        reading = self.dmm.get_reading()
+        if not reading:
+            return 0.0, "", ""
+        return reading.value, reading.unit, reading.mode.value
+    
+    def _flusher_loop(self):
+        """Write queued samples to Excel in batches until logging stops
+        
+        Wakes when _pending_flush_size samples are queued, when
+        _pending_max_age_s has passed, on stop, or when ramp progress is
+        waiting. Rows only go out once they are due, but anything due at
+        the same wakeup is written together.
+        """
+        cv = self._excel_cv
+        pending = self._excel_queue
+        is_set = self._stop_logging.is_set
+        monotonic = time.monotonic
+        last_flush = monotonic()
+        while not is_set():
+            with cv:
+                cv.wait_for(
+                    lambda: (len(pending) >= self._pending_flush_size
+                             or self._pending_ramp is not None
+                             or is_set()),
+                    timeout=max(0.0, last_flush + self._pending_max_age_s - monotonic())
+                )
+                rows_due = (len(pending) >= self._pending_flush_size or is_set()
+                            or monotonic() - last_flush >= self._pending_max_age_s)
+            self._drain_excel_queue(rows_due)
+            if rows_due:
+                last_flush = monotonic()
+    
+    def _drain_excel_queue(self, include_rows: bool = True):
+        """Write queued samples and pending ramp progress to Excel in one pass"""
+        with self._excel_write_lock:
+            with self._excel_cv:
+                if include_rows:
+                    batch = list(self._excel_queue)
+                    self._excel_queue.clear()
+                else:
+                    batch = []
+                ramp = self._pending_ramp
+                self._pending_ramp = None
+            if batch or ramp is not None:
+                self._write_rows_to_excel([self._entry_to_row(entry) for entry in batch], ramp)
+    
+    @staticmethod
+    def _entry_to_row(entry: LogEntry) -> tuple:
+        """Convert a log entry to a Data sheet row"""
+        row = (
+            entry.timestamp.isoformat(sep=' ', timespec='milliseconds'),
+            entry.elapsed_s,
+            entry.psu_voltage,
+            entry.psu_current,
+            entry.psu_setpoint_v,
+            entry.psu_setpoint_a,
+            entry.dmm_value,
+            entry.dmm_unit,
+            entry.dmm_mode
+        )
+        if entry.psu_voltage != entry.psu_voltage or entry.dmm_value != entry.dmm_value:
+            row = _blank_nan(row)
+        return row
+    
+    def _write_entry_to_excel(self, entry: LogEntry):
+        """Write a single log entry to Excel immediately"""
+        self._write_rows_to_excel([self._entry_to_row(entry)])
+    
+    def _write_rows_to_excel(self, rows: List[tuple], ramp: Optional[tuple] = None):
+        """Write rows to the Data sheet as one block and refresh the live cells
+        
+        ramp, if given, is written to the ramp cells inside the same
+        redraw/recalculation pause. Progress on its own is written directly:
+        pausing Excel would cost more COM calls than the three cell writes.
+        """
+        with self._excel_write_lock:
+            if not rows:
+                if ramp is not None:
+                    self._write_ramp_progress(ramp)
+                return
+            if not self.data_sheet:
+                return
+            try:
+                with self._suspend_excel_updates():
+                    if ramp is not None:
+                        self._write_ramp_progress(ramp)
+                    first = self._excel_update_row
+                    last = first + len(rows) - 1
+                    self.data_sheet.range(f"A{first}:I{last}").value = rows
+                    self._excel_update_row = last + 1
+                    self._excel_last_written_row = last
+                    
+                    # Update live display cells from the newest row
+                    if self.live_display_enabled:
+                        latest = rows[-1]
+                        if self._r_live_v is not None:
+                            self._r_live_v.value = latest[2]
+                        if self._r_live_i is not None:
+                            self._r_live_i.value = latest[3]
+                        if self._r_live_dmm is not None:
+                            self._r_live_dmm.value = (f"{latest[6]:.4f} {latest[7]}"
+                                                      if latest[6] is not None else None)
+            except Exception as e:
+                log.warning("Excel write error: %s", e)
     
     def export_csv(self, filepath: str) -> bool:
         """Export log data to CSV file"""
         try:
             with open(filepath, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow([
-                    "Timestamp", "Elapsed_s", "PSU_Voltage_V", "PSU_Current_A",
-                    "PSU_Setpoint_V", "PSU_Setpoint_A", "DMM_Value", "DMM_Unit", "DMM_Mode"
-                ])
-                for entry in self.log_data:
-                    writer.writerow([
-                        entry.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
-                        f"{entry.elapsed_s:.3f}",
-                        f"{entry.psu_voltage:.4f}",
-                        f"{entry.psu_current:.4f}",
-                        f"{entry.psu_setpoint_v:.2f}",
-                        f"{entry.psu_setpoint_a:.3f}",
-                        f"{entry.dmm_value:.6f}",
-                        entry.dmm_unit,
-                        entry.dmm_mode
-                    ])
+                writer.writerow(CSV_HEADER)
+                for columns in self._iter_log_columns():
+                    _write_csv_columns(writer, columns)
             return True
         except Exception as e:
             print(f"CSV export error: {e}")
             return False
     
+    def export_xlsx(self, filepath: str) -> bool:
+        """Export log data to an XLSX file, bypassing Excel/COM
+        
+        Uses an openpyxl write-only workbook so rows stream to disk
+        instead of being held as cell objects.
+        """
+        if not OPENPYXL_AVAILABLE:
+            print("openpyxl not installed. Install with: pip install openpyxl")
+            return False
+        try:
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Data")
+            ws.append(CSV_HEADER)
+            append = ws.append
+            from_wall_seconds = _from_wall_seconds
+            for columns in self._iter_log_columns():
+                for row in zip(*columns):
+                    if row[2] != row[2] or row[6] != row[6]:
+                        row = _blank_nan(row)
+                    append((from_wall_seconds(row[0]),) + row[1:])
+            wb.save(filepath)
+            return True
+        except Exception as e:
+            print(f"XLSX export error: {e}")
+            return False
+    
+    def get_log_count(self) -> int:
+        """Number of samples logged, including those spilled to disk"""
+        return self._spill_count + len(self.log_data)
+    
+    def _spill_oldest(self):
+        """Move the oldest half of the in-memory log to a shard on disk"""
+        with self._spill_lock:
+            columns = self.log_data.pop_oldest(self._spill_threshold // 2)
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="voltampero_")
+                _spill_dirs.add(self._spill_dir)
+            path = os.path.join(self._spill_dir, f"voltampero_shard{self._spill_shard}.pkl")
+            self._spill_shard += 1
+            self._spill_count += len(columns[0])
+            self._spill_files.append(path)
+            if self._spill_pool is None:
+                self._spill_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="va_spill")
+            self._spill_futures.append(self._spill_pool.submit(self._write_shard, path, columns))
+    
+    @staticmethod
+    def _write_shard(path: str, columns: tuple):
+        """Write spilled columns to a shard at full precision
+        
+        The columns are stored as-is (array('d') pickles as raw doubles)
+        and only formatted on export, so shard rows match in-memory rows.
+        """
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(columns, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            log.warning("Log spill error: %s", e)
+    
+    def _iter_log_columns(self):
+        """Yield the logged columns oldest first: each shard, then memory"""
+        with self._spill_lock:
+            shards = list(self._spill_files)
+            futures = list(self._spill_futures)
+            columns = self.log_data.columns()
+        for future in futures:
+            future.result()
+        for shard in shards:
+            with open(shard, 'rb') as f:
+                yield pickle.load(f)
+        yield columns
+    
+    def _reset_spill(self):
+        """Delete spilled shards and start counting again"""
+        with self._spill_lock:
+            futures = self._spill_futures
+            spill_dir = self._spill_dir
+            self._spill_futures = []
+            self._spill_files = []
+            self._spill_dir = None
+            self._spill_shard = 0
+            self._spill_count = 0
+        for future in futures:
+            future.result()
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+            _spill_dirs.discard(spill_dir)
+    
     def clear_log(self):
         """Clear log data"""
-        self.log_data = []
+        self.log_data.clear()
+        self._reset_spill()
         self._excel_update_row = 2
-        if self.data_sheet:
-            try:
-                last_row = self.data_sheet.range("A1").end('down').row
-                if last_row > 1:
-                    self.data_sheet.range(f"A2:I{last_row}").clear_contents()
-            except:
-                pass
+        with self._excel_cv:
+            self._excel_queue.clear()
+        self._clear_data_sheet()
+    
+    def _clear_data_sheet(self):
+        """Clear the data rows below the Data sheet header"""
+        if not self.data_sheet:
+            return
+        try:
+            # Rows we wrote are tracked locally; fall back to Excel's used
+            # range (one COM call) when nothing has been written yet
+            last_row = self._excel_last_written_row
+            if last_row <= 1:
+                last_row = self.data_sheet.used_range.last_cell.row
+            if last_row > 1:
+                self.data_sheet.range(f"A2:I{last_row}").clear_contents()
+            self._excel_last_written_row = 1
+        except _EXCEL_ERRORS:
+            pass
                 
     # ========== Excel Integration ==========
     
@@ -371,6 +881,23 @@ class VoltAmpero:
         if not XLWINGS_AVAILABLE:
             print("xlwings not available")
             return False
+        
+        # Already attached to the calling workbook: skip the sheet and
+        # named-range lookups, which are COM round-trips on every button
+        # click. The UDF server outlives workbooks and serves all of them,
+        # so the caller is still looked up and compared
+        if (self.wb is not None and self.control_sheet is not None
+                and self.data_sheet is not None):
+            try:
+                if workbook is None:
+                    workbook = xw.Book.caller()
+                if workbook == self.wb:
+                    return True
+            except Exception:
+                # No calling workbook (standalone use) or ours was closed
+                if workbook is None and self._workbook_alive():
+                    return True
+            self._detach_excel()
             
         try:
             if workbook:
@@ -378,31 +905,115 @@ class VoltAmpero:
             else:
                 self.wb = xw.Book.caller()
                 
+            self._app = self.wb.app
+            self._excel_last_written_row = 1
+                
             # Get sheets
             self.control_sheet = self.wb.sheets["Control"]
             self.data_sheet = self.wb.sheets["Data"]
+            
+            # Resolve the hot-path named ranges once; each write is then a
+            # single COM call instead of a name lookup plus a write
+            self._r_live_v = self._resolve_range("LiveVoltage")
+            self._r_live_i = self._resolve_range("LiveCurrent")
+            self._r_live_dmm = self._resolve_range("LiveDMM")
+            self._r_ramp_cycle = self._resolve_range("RampCycle")
+            self._r_ramp_v = self._resolve_range("RampVoltage")
+            self._r_ramp_prog = self._resolve_range("RampProgress")
+            
+            self.refresh_live_display_enabled()
             return True
         except Exception as e:
             print(f"Excel attach error: {e}")
             return False
     
+    def _workbook_alive(self) -> bool:
+        """Check that the attached workbook is still open"""
+        try:
+            self.wb.name
+            return True
+        except Exception:
+            return False
+    
+    def _detach_excel(self):
+        """Drop handles to a workbook that has been closed"""
+        self.wb = None
+        self._app = None
+        self.control_sheet = None
+        self.data_sheet = None
+        self._r_live_v = None
+        self._r_live_i = None
+        self._r_live_dmm = None
+        self._r_ramp_cycle = None
+        self._r_ramp_v = None
+        self._r_ramp_prog = None
+        self.live_display_enabled = True
+    
+    def refresh_live_display_enabled(self):
+        """Re-read the LiveDisplayEnabled named range
+        
+        Workbooks that show the latest row with their own formulas can set
+        it to FALSE; blank or missing keeps the live cells updated.
+        """
+        if not self.control_sheet:
+            return
+        r_live_enabled = self._resolve_range("LiveDisplayEnabled")
+        try:
+            live_enabled = r_live_enabled.value if r_live_enabled is not None else None
+        except _EXCEL_ERRORS:
+            live_enabled = None
+        self.live_display_enabled = live_enabled is None or bool(live_enabled)
+    
+    @contextmanager
+    def _suspend_excel_updates(self):
+        """Pause screen redraw and recalculation around a bulk write
+        
+        The previous settings are restored afterwards, so Excel recalculates
+        once per flush rather than once per written range.
+        """
+        app = self._app
+        if app is None:
+            yield
+            return
+        prev_screen = app.screen_updating
+        prev_calc = app.calculation
+        app.screen_updating = False
+        app.calculation = "manual"
+        try:
+            yield
+        finally:
+            app.calculation = prev_calc
+            app.screen_updating = prev_screen
+    
+    def _resolve_range(self, name: str):
+        """Look up a named range on the Control sheet (None if missing)"""
+        try:
+            return self.control_sheet.range(name)
+        except Exception:
+            return None
+    
     def _update_excel_status(self, component: str, status: str):
         """Update status indicator in Excel"""
         if self.control_sheet:
             try:
                 self.control_sheet.range(f"{component}Status").value = status
-            except:
+            except _EXCEL_ERRORS:
                 pass
 
 
 # ========== Global Instance ==========
 _controller: Optional[VoltAmpero] = None
+_controller_lock = threading.Lock()
 
 def get_controller(simulate: bool = False) -> VoltAmpero:
     """Get or create the global controller instance"""
     global _controller
-    if _controller is None:
-        _controller = VoltAmpero(simulate=simulate)
+    if _controller is not None:
+        return _controller
+    # xlwings may run UDFs concurrently; only one of them may create it
+    with _controller_lock:
+        if _controller is None:
+            _controller = VoltAmpero(simulate=simulate)
     return _controller
 
 
@@ -410,14 +1021,14 @@ def get_controller(simulate: bool = False) -> VoltAmpero:
 
 if XLWINGS_AVAILABLE:
     
-    @xw.func
+    @xw.func(call_in_wizard=False, volatile=False)
     def va_list_ports() -> str:
         """List available COM ports"""
         ctrl = get_controller()
         ports = ctrl.list_com_ports()
         return ", ".join(ports) if ports else "No ports found"
     
-    @xw.func
+    @xw.func(call_in_wizard=False, volatile=False)
     def va_connect_psu(port: str) -> str:
         """Connect to PSU"""
         ctrl = get_controller()
@@ -425,7 +1036,7 @@ if XLWINGS_AVAILABLE:
             return f"Connected to {port}"
         return "Connection failed"
     
-    @xw.func
+    @xw.func(call_in_wizard=False, volatile=False)
     def va_connect_dmm() -> str:
         """Connect to multimeter"""
         ctrl = get_controller()
@@ -433,21 +1044,21 @@ if XLWINGS_AVAILABLE:
             return "DMM Connected"
         return "DMM Connection failed"
     
-    @xw.func
+    @xw.func(call_in_wizard=False, volatile=True)
     def va_get_voltage() -> float:
         """Get PSU output voltage"""
         ctrl = get_controller()
         v, _ = ctrl.get_psu_readings()
         return v
     
-    @xw.func
+    @xw.func(call_in_wizard=False, volatile=True)
     def va_get_current() -> float:
         """Get PSU output current"""
         ctrl = get_controller()
         _, a = ctrl.get_psu_readings()
         return a
     
-    @xw.func
+    @xw.func(call_in_wizard=False, volatile=True)
     def va_get_dmm() -> str:
         """Get DMM reading with unit"""
         ctrl = get_controller()
@@ -488,6 +1099,7 @@ if XLWINGS_AVAILABLE:
         """Start data logging"""
         ctrl = get_controller()
         ctrl.attach_excel()
+        ctrl.refresh_live_display_enabled()
         interval = 300
         try:
             interval = int(ctrl.control_sheet.range("LogInterval").value or 300)
@@ -512,6 +1124,20 @@ if XLWINGS_AVAILABLE:
         else:
             ctrl.control_sheet.range("ExportStatus").value = "Export failed"
     
+    @xw.sub
+    def va_export_xlsx():
+        """Export data to XLSX"""
+        ctrl = get_controller()
+        if not OPENPYXL_AVAILABLE:
+            ctrl.control_sheet.range("ExportStatus").value = "Export failed: openpyxl not installed (pip install openpyxl)"
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = os.path.join(os.path.dirname(ctrl.wb.fullname), f"voltampero_log_{timestamp}.xlsx")
+        if ctrl.export_xlsx(filepath):
+            ctrl.control_sheet.range("ExportStatus").value = f"Exported: {filepath}"
+        else:
+            ctrl.control_sheet.range("ExportStatus").value = "Export failed"
+    
     @xw.sub
     def va_clear_data():
         """Clear log data"""
@@ -563,7 +1189,8 @@ if XLWINGS_AVAILABLE:
     def va_init_simulated():
         """Initialize with simulated devices for testing"""
         global _controller
-        _controller = VoltAmpero(simulate=True)
+        with _controller_lock:
+            _controller = VoltAmpero(simulate=True)
         _controller.attach_excel()
         _controller.connect_psu("SIM1")
         _controller.connect_dmm()
@@ -596,7 +1223,7 @@ def main():
     time.sleep(5)
     ctrl.stop_logging()
     
-    print(f"\nCaptured {len(ctrl.log_data)} readings")
+    print(f"\nCaptured {ctrl.get_log_count()} readings")
     
     # Export
     ctrl.export_csv("test_log.csv")